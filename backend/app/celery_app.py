@@ -1,10 +1,25 @@
 """Celery application configuration for async task execution."""
 
+import sys
+
+import orjson
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
+from kombu.serialization import register
+
 from .config import get_settings
 
 settings = get_settings()
 
+# orjson-backed JSON codec for producers that can't speak msgpack
+register(
+    "orjson",
+    orjson.dumps,
+    orjson.loads,
+    content_type="application/x-orjson",
+    content_encoding="utf-8",
+)
+
 # Create Celery app
 celery_app = Celery(
     "tbench_runner",
@@ -15,10 +30,11 @@ celery_app = Celery(
 
 # Celery configuration
 celery_app.conf.update(
-    # Task settings
-    task_serializer="json",
-    accept_content=["json"],
-    result_serializer="json",
+    # Task settings (msgpack is smaller/faster than json; orjson/json still
+    # accepted for producers that can't use msgpack and for older messages)
+    task_serializer="msgpack",
+    accept_content=["msgpack", "orjson", "json"],
+    result_serializer="msgpack",
     timezone="UTC",
     enable_utc=True,
     
@@ -26,8 +42,13 @@ celery_app.conf.update(
     result_expires=3600,  # Results expire after 1 hour
     
     # Worker settings
-    worker_prefetch_multiplier=1,  # Don't prefetch tasks (Harbor is slow)
-    worker_concurrency=4,  # 4 concurrent Harbor runs per worker
+    # Default for the harbor queue (runs take minutes, so don't prefetch).
+    # Concurrency and the prefetch for the short-task "celery" queue are set
+    # per worker at launch (-c / -P / --prefetch-multiplier), see start_worker.sh.
+    worker_prefetch_multiplier=1,
+    
+    # Broker settings
+    broker_pool_limit=10,  # Reuse pooled Redis connections for publishing
     
     # Task execution settings
     task_acks_late=True,  # Ack after task completes (for reliability)
@@ -50,3 +71,33 @@ celery_app.conf.beat_schedule = {
         'schedule': 60.0,  # Every 60 seconds
     },
 }
+
+
+@worker_init.connect
+def _patch_psycopg_for_eventlet(**kwargs):
+    """
+    Make psycopg2 cooperative in eventlet workers (the short-task queue).
+    
+    Its queries otherwise block in C, stalling every green thread in the
+    worker until they return.
+    """
+    if "eventlet" not in sys.modules:
+        return
+    from eventlet import patcher
+    if patcher.is_monkey_patched("socket"):
+        from psycogreen.eventlet import patch_psycopg
+        patch_psycopg()
+
+
+@worker_process_init.connect
+def _reset_db_pool(**kwargs):
+    """Give each forked worker process its own DB pool instead of the parent's sockets."""
+    from .database import engine
+    engine.dispose(close=False)
+
+
+@worker_process_init.connect
+def _setup_worker_logging(**kwargs):
+    """Queue the app's log records in each worker process (the listener thread is started after the fork)."""
+    from .logging_config import setup_logging
+    setup_logging(json_format=settings.log_format == "json")
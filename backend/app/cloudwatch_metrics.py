@@ -1,18 +1,45 @@
 """CloudWatch metrics for auto-scaling based on queue depth."""
 
+import logging
 import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
 import boto3
 from typing import Optional
 
+from .config import get_settings
+
 # Lazy import celery to avoid circular imports
 try:
     from celery import current_app
 except ImportError:
     current_app = None
 
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
 # Initialize CloudWatch client (lazy)
 _cloudwatch_client: Optional[boto3.client] = None
 
+# Metrics are published from a background thread; producers only enqueue
+# CloudWatch accepts up to 1000 datums per PutMetricData call
+MAX_DATUMS_PER_CALL = 1000
+_metric_queue: "queue.Queue[dict]" = queue.Queue(maxsize=1024)
+_publisher_thread: Optional[threading.Thread] = None
+_publisher_lock = threading.Lock()
+
+# Celery uses these keys: celery, harbor (from task_routes)
+CELERY_QUEUES = ("celery", "harbor")
+
+# Queue depth is cached briefly so bursts of callers hit Redis once
+QUEUE_DEPTH_CACHE_TTL = 2.0  # seconds
+_queue_depth_cache = {"ts": float("-inf"), "value": 0}
+
+# Shared Redis connection pool for queue depth probes (lazy)
+_redis_pool = None
+
 
 def get_cloudwatch_client():
     """Get or create CloudWatch client."""
@@ -25,46 +52,50 @@ def get_cloudwatch_client():
     return _cloudwatch_client
 
 
+def get_redis_client():
+    """Get a Redis client backed by a shared connection pool."""
+    global _redis_pool
+    import redis
+    if _redis_pool is None:
+        _redis_pool = redis.ConnectionPool.from_url(
+            settings.redis_url,
+            max_connections=16,
+            decode_responses=True,
+        )
+    return redis.Redis(connection_pool=_redis_pool)
+
+
 def get_celery_queue_depth() -> int:
     """
     Get the current depth of the Celery queue.
     
     Returns the total number of tasks waiting to be processed.
-    Uses Redis directly to get accurate queue length.
+    Results are cached for QUEUE_DEPTH_CACHE_TTL seconds so that bursty
+    callers share a single Redis round-trip.
     """
+    now = time.monotonic()
+    if now - _queue_depth_cache["ts"] < QUEUE_DEPTH_CACHE_TTL:
+        return _queue_depth_cache["value"]
+    
+    queue_depth = _read_celery_queue_depth()
+    _queue_depth_cache["ts"] = now
+    _queue_depth_cache["value"] = queue_depth
+    return queue_depth
+
+
+def _read_celery_queue_depth() -> int:
+    """Read the queue depth, using Redis directly to get accurate queue length."""
     try:
-        import redis
-        from .config import get_settings
+        r = get_redis_client()
         
-        settings = get_settings()
+        # Get length of Celery queues in a single round-trip
+        # Non-transactional: no MULTI/EXEC wrapper needed for read-only LLENs
+        with r.pipeline(transaction=False) as pipe:
+            for queue_name in CELERY_QUEUES:
+                pipe.llen(queue_name)
+            lengths = pipe.execute()
         
-        # Parse Redis URL
-        redis_url = settings.redis_url.replace("redis://", "")
-        if "/" in redis_url:
-            host_port, db = redis_url.split("/")
-        else:
-            host_port, db = redis_url, "0"
-        
-        if ":" in host_port:
-            host, port = host_port.split(":")
-        else:
-            host, port = host_port, "6379"
-        
-        # Connect to Redis and get queue length
-        r = redis.Redis(host=host, port=int(port), db=int(db), decode_responses=True)
-        
-        # Get length of Celery queues
-        # Celery uses these keys: celery, harbor (from task_routes)
-        queue_length = 0
-        for queue_name in ["celery", "harbor"]:
-            try:
-                length = r.llen(queue_name)
-                if length:
-                    queue_length += length
-            except Exception:
-                pass  # Queue might not exist yet
-        
-        return queue_length
+        return sum(length for length in lengths if length)
         
     except Exception as e:
         # Fallback: try Celery inspect (less reliable, but works if Redis fails)
@@ -89,36 +120,78 @@ def get_celery_queue_depth() -> int:
             return total_tasks
         except Exception as e2:
             # If we can't get queue depth, return 0 (don't break the app)
-            print(f"⚠️  Could not get Celery queue depth: {e}, {e2}")
+            logger.warning("⚠️  Could not get Celery queue depth: %s, %s", e, e2)
             return 0
 
 
+def _ensure_publisher_thread():
+    """Start the background CloudWatch publisher if it isn't running in this process."""
+    global _publisher_thread
+    with _publisher_lock:
+        if _publisher_thread is None or not _publisher_thread.is_alive():
+            _publisher_thread = threading.Thread(
+                target=_publish_metrics_loop,
+                name="cloudwatch-publisher",
+                daemon=True,
+            )
+            _publisher_thread.start()
+
+
+def _enqueue_metric(datum: dict):
+    """Queue a metric datum for publishing, dropping the oldest one if the queue is full."""
+    _ensure_publisher_thread()
+    while True:
+        try:
+            _metric_queue.put_nowait(datum)
+            return
+        except queue.Full:
+            try:
+                _metric_queue.get_nowait()
+            except queue.Empty:
+                pass
+
+
+def _publish_metrics_loop():
+    """Drain the metric queue, sending everything queued so far in one PutMetricData call."""
+    while True:
+        batch = [_metric_queue.get()]
+        while len(batch) < MAX_DATUMS_PER_CALL:
+            try:
+                batch.append(_metric_queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        try:
+            cloudwatch = get_cloudwatch_client()
+            cloudwatch.put_metric_data(Namespace='TBench/Celery', MetricData=batch)
+            logger.info("📊 Published %d metric datapoint(s) to CloudWatch", len(batch))
+        except Exception as e:
+            # Don't break the app if CloudWatch fails
+            logger.warning("⚠️  Could not publish metrics to CloudWatch: %s", e)
+
+
 def publish_queue_depth_metric():
     """
     Publish Celery queue depth to CloudWatch.
     
     This metric is used by AWS Auto Scaling to scale workers based on
-    actual queue depth rather than just CPU usage.
+    actual queue depth rather than just CPU usage. The datapoint is handed
+    to a background publisher thread, so this returns without waiting on
+    the CloudWatch API.
     """
     try:
         queue_depth = get_celery_queue_depth()
         
-        # Publish to CloudWatch
-        cloudwatch = get_cloudwatch_client()
-        cloudwatch.put_metric_data(
-            Namespace='TBench/Celery',
-            MetricData=[{
-                'MetricName': 'QueueDepth',
-                'Value': queue_depth,
-                'Unit': 'Count',
-                'Timestamp': None,  # Use current time
-            }]
-        )
+        _enqueue_metric({
+            'MetricName': 'QueueDepth',
+            'Value': queue_depth,
+            'Unit': 'Count',
+            'Timestamp': datetime.now(timezone.utc),
+        })
         
-        print(f"📊 Published queue depth metric: {queue_depth} tasks")
+        logger.info("📊 Queued queue depth metric: %d tasks", queue_depth)
         return queue_depth
         
     except Exception as e:
-        # Don't break the app if CloudWatch fails
-        print(f"⚠️  Could not publish queue depth metric: {e}")
+        logger.warning("⚠️  Could not publish queue depth metric: %s", e)
         return None
@@ -15,9 +15,16 @@ class Settings(BaseSettings):
     debug: bool = False
     host: str = "0.0.0.0"
     port: int = 8000
+    log_format: str = "text"  # "text" or "json" (orjson-encoded lines)
     
     # Database - PostgreSQL for production, SQLite for dev
     database_url: str = "sqlite:///./tbench_runner.db"
+    # Postgres connections per engine; every process has a sync and an async
+    # engine, so it can open up to 2 x (pool_size + max_overflow). The
+    # deployment sets these per service, see infrastructure/terraform
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_recycle: int = 1800  # Recycle connections before LB/idle timeouts
     
     # Redis
     redis_url: str = "redis://localhost:6379/0"
@@ -43,6 +50,10 @@ class Settings(BaseSettings):
     harbor_default_agent: str = "terminus-2"
     harbor_default_env: str = "docker"
     harbor_n_concurrent: int = 4
+    # Cluster-wide Harbor run starts per second, split evenly across this
+    # many harbor workers (Celery rate limits are enforced per worker)
+    harbor_run_starts_per_second: float = 20.0
+    harbor_worker_count: int = 1
     
     # OpenRouter API (required for LLM execution)
     openrouter_api_key: str = ""
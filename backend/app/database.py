@@ -1,30 +1,94 @@
 """Database connection and session management."""
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import StaticPool
 from contextlib import contextmanager
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
 from .config import get_settings
 from .models import Base
 
 settings = get_settings()
 
-# Create engine based on database URL
+# Compiled-statement cache entries per engine (SQLAlchemy defaults to 500)
+QUERY_CACHE_SIZE = 1200
+
+# What a sqlite ":memory:" URL is mapped to, so the sync and async engines
+# see the same in-memory database
+SHARED_MEMORY_DATABASE_URL = "sqlite:///file:tbench_runner?mode=memory&cache=shared&uri=true"
+
+
+def _async_database_url(url: str) -> str:
+    """Map the configured (sync) database URL onto its asyncio driver."""
+    scheme, sep, rest = url.partition("://")
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite{sep}{rest}"
+    if scheme.startswith(("postgresql", "postgres")):
+        return f"postgresql+asyncpg{sep}{rest}"
+    return url
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers proceed while a writer commits; NORMAL sync skips an fsync per commit."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")  # honor ON DELETE CASCADE
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256MB
+    cursor.close()
+
+
+# Create engines based on database URL
+# The sync engine serves the Celery workers and the write endpoints; the
+# async engine serves the read endpoints without tying up a worker thread
 if settings.database_url.startswith("sqlite"):
+    database_url = settings.database_url
+    sqlite_kwargs = dict(query_cache_size=QUERY_CACHE_SIZE)
+    if ":memory:" in database_url:
+        # A plain in-memory DB only exists per connection, and the two engines
+        # would each get their own: use one named shared-cache DB instead, and
+        # keep a single connection per engine open so it isn't dropped
+        database_url = SHARED_MEMORY_DATABASE_URL
+        sqlite_kwargs["poolclass"] = StaticPool
     engine = create_engine(
-        settings.database_url,
-        connect_args={"check_same_thread": False}
+        database_url,
+        connect_args={"check_same_thread": False},
+        **sqlite_kwargs,
+    )
+    async_engine = create_async_engine(
+        _async_database_url(database_url),
+        **sqlite_kwargs,
     )
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
 else:
-    engine = create_engine(settings.database_url)
+    pool_kwargs = dict(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_pre_ping=True,  # Detect connections dropped by LB/idle timeouts
+        pool_recycle=settings.db_pool_recycle,
+        pool_use_lifo=True,  # Keep a small set of warm connections in use
+        query_cache_size=QUERY_CACHE_SIZE,
+    )
+    engine = create_engine(settings.database_url, **pool_kwargs)
+    async_engine = create_async_engine(_async_database_url(settings.database_url), **pool_kwargs)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 
 def create_tables():
     """Create all database tables."""
     Base.metadata.create_all(bind=engine)
+    
+    # create_all skips tables that already exist, so add any indexes that
+    # were introduced after the tables were first created
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -36,6 +100,12 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Get an async database session for FastAPI dependency injection."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 @contextmanager
 def get_db_session() -> Generator[Session, None, None]:
     """Get database session for use outside of FastAPI routes."""
@@ -0,0 +1,74 @@
+"""Logging setup - records are queued and written out by a background thread."""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+import orjson
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonBytesHandler(logging.Handler):
+    """
+    Write each record as one orjson-encoded line straight to a binary stream.
+    
+    Tracebacks arrive already folded into the message by QueueHandler.
+    Defaults to the process's real stderr: in Celery workers sys.stderr is
+    a LoggingProxy, which has no binary buffer.
+    """
+    
+    def __init__(self, stream=None):
+        super().__init__()
+        self.stream = stream if stream is not None else sys.__stderr__.buffer
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            event = {
+                "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+                "level": record.levelname.lower(),
+                "logger": record.name,
+                "event": record.getMessage(),
+            }
+            self.stream.write(orjson.dumps(event, option=orjson.OPT_APPEND_NEWLINE))
+            self.stream.flush()
+        except Exception:
+            self.handleError(record)
+
+
+def setup_logging(level: int = logging.INFO, json_format: bool = False) -> None:
+    """
+    Route the app's loggers through a QueueHandler.
+    
+    Callers only enqueue log records; a single QueueListener thread formats
+    them and writes to stderr, so request handlers never block on stdout.
+    With json_format, records are written as orjson-encoded JSON lines.
+    Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    
+    log_queue = queue.SimpleQueue()
+    
+    if json_format:
+        output_handler = JsonBytesHandler()
+    else:
+        # Not sys.stderr: Celery redirects it into logging, which would loop
+        output_handler = logging.StreamHandler(sys.__stderr__)
+        output_handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s")
+        )
+    
+    _listener = logging.handlers.QueueListener(log_queue, output_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    
+    app_logger = logging.getLogger("app")
+    app_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    app_logger.setLevel(level)
+    app_logger.propagate = False
@@ -3,9 +3,9 @@
 from datetime import datetime
 from enum import Enum
 from typing import Optional, List
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, ForeignKey, JSON, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from pydantic import BaseModel
 
 
@@ -54,7 +54,7 @@ class Task(Base):
     
     # Status
     status = Column(String(20), nullable=False, default=TaskStatus.PENDING.value)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)  # Unfiltered task list order
     started_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
     
@@ -67,7 +67,12 @@ class Task(Base):
     failed_runs = Column(Integer, default=0)
     
     # Relationships
-    runs = relationship("Run", back_populates="task", cascade="all, delete-orphan")
+    runs = relationship("Run", back_populates="task", cascade="all, delete-orphan", passive_deletes=True)
+    
+    __table_args__ = (
+        # Task list: optional status filter, newest first
+        Index("ix_tasks_status_createdat", "status", created_at.desc()),
+    )
 
 
 class Run(Base):
@@ -75,7 +80,7 @@ class Run(Base):
     __tablename__ = "runs"
     
     id = Column(Integer, primary_key=True, index=True)
-    task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
     run_number = Column(Integer, nullable=False)
     
     # Status
@@ -89,7 +94,8 @@ class Run(Base):
     tests_failed = Column(Integer, default=0)
     
     # Logs and output
-    logs = Column(Text, nullable=True)
+    # Logs (up to 50KB) are only loaded on request - see the /logs endpoint
+    logs = deferred(Column(Text, nullable=True))
     error_message = Column(Text, nullable=True)
     output_path = Column(String(512), nullable=True)
     
@@ -101,6 +107,13 @@ class Run(Base):
     
     # Relationship
     task = relationship("Task", back_populates="runs")
+    
+    __table_args__ = (
+        # Runs are always fetched per task, ordered by run number
+        Index("ix_runs_taskid_runnumber", "task_id", "run_number"),
+        # Per-task status counts in _update_task_stats
+        Index("ix_runs_task_status", "task_id", "status"),
+    )
 
 
 # Pydantic Schemas
@@ -147,7 +160,6 @@ class RunResponse(BaseModel):
     tests_total: int
     tests_passed: int
     tests_failed: int
-    logs: Optional[str]
     error_message: Optional[str]
     duration_seconds: Optional[float]
     
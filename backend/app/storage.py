@@ -1,69 +1,151 @@
 """File storage abstraction - supports local and S3."""
 
+import logging
 import os
 import shutil
 from pathlib import Path
-from typing import BinaryIO, Optional
+from typing import BinaryIO, Optional, Tuple
 import uuid
 
 from .config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Settings read on every upload, resolved once at import
+USE_S3 = bool(settings.use_s3)
+UPLOAD_DIR = Path(settings.upload_dir)
+
+# Uploads are copied in chunks of this size (peak memory is one chunk)
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+# S3 multipart part size (S3 requires at least 5MB for all but the last part)
+S3_PART_SIZE = 8 * 1024 * 1024  # 8MB
+
+# Parts uploaded in parallel per file (each holds one part in memory)
+S3_MAX_CONCURRENCY = 8
+
+# HTTP connections the shared S3 client keeps (botocore defaults to 10)
+S3_MAX_POOL_CONNECTIONS = 50
 
 # Lazy import boto3 only when needed
 _s3_client = None
 
 
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the allowed size (nothing is kept)."""
+
+
 def get_s3_client():
-    """Get or create S3 client."""
+    """Get or create the shared S3 client (thread-safe, pooled connections)."""
     global _s3_client
     if _s3_client is None:
         import boto3
+        from botocore.config import Config
         _s3_client = boto3.client(
             's3',
             region_name=settings.aws_region,
             aws_access_key_id=settings.aws_access_key_id or None,
             aws_secret_access_key=settings.aws_secret_access_key or None,
+            config=Config(
+                max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                retries={"max_attempts": 3, "mode": "adaptive"},
+                tcp_keepalive=True,
+            ),
         )
     return _s3_client
 
 
-def save_upload(file: BinaryIO, filename: str, task_id: str = None) -> str:
+def save_upload(
+    file: BinaryIO,
+    filename: str,
+    task_id: str = None,
+    max_size: Optional[int] = None,
+) -> Tuple[str, int]:
     """
-    Save an uploaded file.
+    Save an uploaded file, streaming it in chunks.
+    
+    Raises UploadTooLarge (after discarding what was written) as soon as
+    more than max_size bytes have been read.
     
-    Returns the path/key where the file is stored.
+    Returns (path/key where the file is stored, size in bytes).
     """
     if task_id is None:
         task_id = str(uuid.uuid4())
     
-    if settings.use_s3:
-        return _save_to_s3(file, filename, task_id)
+    if USE_S3:
+        return _save_to_s3(file, filename, task_id, max_size)
     else:
-        return _save_to_local(file, filename, task_id)
+        return _save_to_local(file, filename, task_id, max_size)
 
 
-def _save_to_local(file: BinaryIO, filename: str, task_id: str) -> str:
+def _read_chunks(file: BinaryIO, chunk_size: int, max_size: Optional[int]):
+    """Yield chunks of file, raising UploadTooLarge once max_size is exceeded."""
+    size = 0
+    while chunk := file.read(chunk_size):
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            raise UploadTooLarge(f"Upload exceeds {max_size} bytes")
+        yield chunk
+
+
+def _save_to_local(file: BinaryIO, filename: str, task_id: str, max_size: Optional[int]) -> Tuple[str, int]:
     """Save file to local filesystem."""
-    upload_dir = Path(settings.upload_dir) / task_id
+    upload_dir = UPLOAD_DIR / task_id
     upload_dir.mkdir(parents=True, exist_ok=True)
     
     file_path = upload_dir / filename
     
-    with open(file_path, 'wb') as f:
-        shutil.copyfileobj(file, f)
+    size = 0
+    try:
+        with open(file_path, 'wb') as f:
+            for chunk in _read_chunks(file, UPLOAD_CHUNK_SIZE, max_size):
+                f.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        raise
+    
+    return str(file_path), size
+
+
+class _SizeLimitedReader:
+    """Read-only view of a file that raises UploadTooLarge past max_size bytes."""
     
-    return str(file_path)
+    def __init__(self, file: BinaryIO, max_size: Optional[int]):
+        self._file = file
+        self._max_size = max_size
+        self.size = 0
+    
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._file.read(size)
+        self.size += len(chunk)
+        if self._max_size is not None and self.size > self._max_size:
+            raise UploadTooLarge(f"Upload exceeds {self._max_size} bytes")
+        return chunk
 
 
-def _save_to_s3(file: BinaryIO, filename: str, task_id: str) -> str:
-    """Save file to S3."""
+def _save_to_s3(file: BinaryIO, filename: str, task_id: str, max_size: Optional[int]) -> Tuple[str, int]:
+    """Save file to S3 - multipart with parallel part uploads above one part's size."""
+    from boto3.s3.transfer import TransferConfig
+    
     s3 = get_s3_client()
+    bucket = settings.s3_bucket_name
     key = f"uploads/{task_id}/{filename}"
     
-    s3.upload_fileobj(file, settings.s3_bucket_name, key)
+    # The reader is read sequentially (parts are handed to worker threads);
+    # a failed or oversized upload is aborted by the transfer manager
+    reader = _SizeLimitedReader(file, max_size)
+    s3.upload_fileobj(
+        reader, bucket, key,
+        Config=TransferConfig(
+            multipart_threshold=S3_PART_SIZE,
+            multipart_chunksize=S3_PART_SIZE,
+            max_concurrency=S3_MAX_CONCURRENCY,
+        ),
+    )
     
-    return f"s3://{settings.s3_bucket_name}/{key}"
+    return f"s3://{bucket}/{key}", reader.size
 
 
 def get_file(path: str) -> Optional[str]:
@@ -114,7 +196,7 @@ def delete_file(path: str) -> bool:
                     os.rmdir(parent)
             return True
     except Exception as e:
-        print(f"Failed to delete file {path}: {e}")
+        logger.warning("Failed to delete file %s: %s", path, e)
         return False
 
 
@@ -131,6 +213,6 @@ def _delete_from_s3(s3_path: str) -> bool:
         s3.delete_object(Bucket=bucket, Key=key)
         return True
     except Exception as e:
-        print(f"Failed to delete from S3 {s3_path}: {e}")
+        logger.warning("Failed to delete from S3 %s: %s", s3_path, e)
         return False
 
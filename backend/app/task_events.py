@@ -0,0 +1,108 @@
+"""Task progress notifications over Redis pub/sub (feeds /api/tasks/{id}/events)."""
+
+import asyncio
+import logging
+from typing import Optional
+
+from .config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# One channel per task; messages only say "this task changed", listeners
+# re-read the task themselves
+TASK_EVENTS_CHANNEL = "task-events:{task_id}"
+
+# Publishing is best effort and must never hold up a run's bookkeeping
+REDIS_SOCKET_TIMEOUT = 1.0  # seconds
+
+# Shared Redis connection pool for publishing, and the API's client for
+# subscribing (each subscription holds one of its connections); both lazy
+_redis_pool = None
+_async_client = None
+
+
+def _channel(task_id: int) -> str:
+    return TASK_EVENTS_CHANNEL.format(task_id=task_id)
+
+
+def publish_task_event(task_id: int):
+    """
+    Tell listeners a task's status or counts changed. Call after the commit.
+    
+    Failures are only logged: listeners re-read the task periodically, so a
+    lost notification just delays an update.
+    """
+    global _redis_pool
+    try:
+        import redis
+        if _redis_pool is None:
+            _redis_pool = redis.ConnectionPool.from_url(
+                settings.redis_url,
+                max_connections=16,
+                socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
+            )
+        redis.Redis(connection_pool=_redis_pool).publish(_channel(task_id), b"changed")
+    except Exception as e:
+        logger.debug("Could not publish event for task %s: %s", task_id, e)
+
+
+async def subscribe_task_events(*task_ids: int):
+    """Subscribe to the tasks' notifications. Returns the PubSub, or None if Redis is unavailable."""
+    global _async_client
+    try:
+        import redis.asyncio
+        if _async_client is None:
+            _async_client = redis.asyncio.Redis.from_url(
+                settings.redis_url,
+                socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+            )
+        pubsub = _async_client.pubsub()
+        await pubsub.subscribe(*(_channel(task_id) for task_id in task_ids))
+        return pubsub
+    except Exception as e:
+        logger.warning("⚠️ Task events unavailable, falling back to re-checks: %s", e)
+        return None
+
+
+async def wait_for_task_event(pubsub, timeout: float) -> Optional[object]:
+    """
+    Wait up to timeout seconds for a notification (or just sleep without a
+    subscription). Notifications that arrived in the meantime are drained, so
+    a burst of finished runs costs listeners a single re-read.
+    
+    Returns the PubSub to keep using (None once it has failed).
+    """
+    if pubsub is None:
+        await asyncio.sleep(timeout)
+        return None
+    
+    try:
+        # Skip the subscribe confirmations (one per channel) - only a
+        # published message counts as a notification
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            message = await pubsub.get_message(timeout=max(0.0, deadline - loop.time()))
+            if message is None or message["type"] == "message":
+                break
+        
+        while message is not None:
+            message = await pubsub.get_message(timeout=0)
+        return pubsub
+    except Exception as e:
+        logger.warning("⚠️ Task events subscription lost, falling back to re-checks: %s", e)
+        await close_task_events(pubsub)
+        await asyncio.sleep(timeout)
+        return None
+
+
+async def close_task_events(pubsub):
+    """Unsubscribe and release the subscription's connection."""
+    if pubsub is None:
+        return
+    try:
+        await pubsub.aclose()
+    except Exception:
+        pass
@@ -1,7 +1,11 @@
 """Celery tasks for async Harbor execution."""
 
+import logging
 from datetime import datetime
-from celery import shared_task
+from celery import group, shared_task
+from celery.exceptions import Retry
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 
 from .celery_app import celery_app
@@ -10,14 +14,30 @@ from .models import Task, Run, TaskStatus, RunStatus
 from .harbor_runner import run_task_sync
 from .config import get_settings
 from .cloudwatch_metrics import publish_queue_depth_metric
+from .task_events import publish_task_event
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Harbor runs each worker may start per second. Starting many Docker
+# environments at the same instant races on the host, so starts are spread
+# out by each worker's token bucket (instead of ETA countdowns, which every
+# worker prefetches and holds in memory until they're due). Celery's
+# rate_limit is per worker, not cluster-wide, so the cluster's target rate
+# is divided by the number of harbor workers
+HARBOR_RUN_RATE_LIMIT = f"{settings.harbor_run_starts_per_second / settings.harbor_worker_count:g}/s"
+
+# Exceptions a run is retried for: the task file not being readable yet and
+# dropped storage/DB connections. Anything else (a bug, a bad task, the 20
+# minute soft time limit) would just fail again, so the run is marked ERROR
+TRANSIENT_EXCEPTIONS = (FileNotFoundError, ConnectionError, TimeoutError, OperationalError)
 
 
 @celery_app.task(
     bind=True,
     max_retries=3,
     default_retry_delay=10,
+    rate_limit=HARBOR_RUN_RATE_LIMIT,
     time_limit=1500,  # Hard limit: 25 minutes (kills task if still running)
     soft_time_limit=1200,  # Soft limit: 20 minutes (raises SoftTimeLimitExceeded)
 )
@@ -34,23 +54,27 @@ def execute_harbor_run(
     This task is called by Celery workers in the background.
     Includes retry logic for transient Docker/file mounting errors.
     """
-    db = SessionLocal()
+    # Keep the task loaded across the RUNNING commit instead of re-SELECTing it
+    db = SessionLocal(expire_on_commit=False)
     
     try:
-        # Get task and run from database
-        task = db.query(Task).filter(Task.id == task_id).first()
-        run = db.query(Run).filter(Run.id == run_id).first()
+        # Get task from database, and update run status to running (no
+        # pending check: a redelivered message has to be able to run it again)
+        task = db.get(Task, task_id)
+        run_found = task is not None and _update_run(
+            db, run_id,
+            status=RunStatus.RUNNING.value,
+            started_at=datetime.utcnow(),
+        )
         
-        if not task or not run:
-            print(f"❌ Task {task_id} or Run {run_id} not found")
+        if not run_found:
+            db.rollback()
+            logger.error("❌ Task %s or Run %s not found", task_id, run_id)
             return {"error": "Task or run not found"}
         
-        # Update run status to running
-        run.status = RunStatus.RUNNING.value
-        run.started_at = datetime.utcnow()
         db.commit()
         
-        print(f"🏃 Celery executing run {run_id} for task {task_id} (attempt {self.request.retries + 1})...")
+        logger.info("🏃 Celery executing run %s for task %s (attempt %d)...", run_id, task_id, self.request.retries + 1)
         
         # Get file (downloads from S3 if needed)
         from .storage import get_file
@@ -58,7 +82,7 @@ def execute_harbor_run(
         if not local_zip_path:
             raise FileNotFoundError(f"Could not get file: {task.file_path}")
         
-        print(f"📦 Extracted task to: {local_zip_path}")
+        logger.info("📦 Extracted task to: %s", local_zip_path)
         
         # Execute Harbor
         result = run_task_sync(
@@ -71,67 +95,78 @@ def execute_harbor_run(
         )
         
         # Check for transient Docker/file errors that should trigger retry
-        logs = result.get("logs", "") or ""
-        is_transient_error = (
-            "No such file or directory" in logs or
-            "/tests/test.sh" in logs and "not found" in logs.lower() or
-            "cannot set terminal process group" in logs
-        )
-        
-        if is_transient_error and not result["success"] and self.request.retries < self.max_retries:
-            print(f"⚠️ Run {run_id} hit transient error, retrying...")
+        # (only failed runs with retries left have their logs scanned)
+        if not result["success"] and self.request.retries < self.max_retries and _is_transient_error(result):
+            logger.warning("⚠️ Run %s hit transient error, retrying...", run_id)
             # Reset run status for retry
-            run.status = RunStatus.PENDING.value
-            run.started_at = None
+            _update_run(db, run_id, status=RunStatus.PENDING.value, started_at=None)
             db.commit()
             raise self.retry(countdown=10)  # Retry after 10 seconds
         
-        # Update run with results
-        run.status = RunStatus.PASSED.value if result["success"] else RunStatus.FAILED.value
-        run.completed_at = datetime.utcnow()
-        run.tests_total = result["tests_total"]
-        run.tests_passed = result["tests_passed"]
-        run.tests_failed = result["tests_failed"]
-        run.logs = result["logs"][:50000] if result["logs"] else None
-        run.error_message = result["error"]
-        run.duration_seconds = result["duration_seconds"]
-        
-        db.commit()
+        # Update run with results (a single UPDATE of just these columns)
+        status = RunStatus.PASSED.value if result["success"] else RunStatus.FAILED.value
+        _update_run(
+            db, run_id,
+            status=status,
+            completed_at=datetime.utcnow(),
+            tests_total=result["tests_total"],
+            tests_passed=result["tests_passed"],
+            tests_failed=result["tests_failed"],
+            logs=result["logs"][:50000] if result["logs"] else None,
+            error_message=result["error"],
+            duration_seconds=result["duration_seconds"],
+        )
         
-        # Update task statistics
+        # Run results and task statistics go in one transaction
         _update_task_stats(db, task)
+        db.commit()
+        publish_task_event(task_id)
         
-        print(f"✅ Celery run {run_id} completed: {'PASSED' if result['success'] else 'FAILED'}")
+        logger.info("✅ Celery run %s completed: %s", run_id, "PASSED" if result["success"] else "FAILED")
         
         return {
             "run_id": run_id,
             "task_id": task_id,
-            "status": run.status,
+            "status": status,
             "success": result["success"],
             "tests_passed": result["tests_passed"],
             "tests_total": result["tests_total"],
         }
         
+    except Retry:
+        # Transient error in the logs: the run was reset to pending above
+        raise
+        
     except Exception as e:
-        print(f"❌ Celery run {run_id} failed: {e}")
+        retrying = isinstance(e, TRANSIENT_EXCEPTIONS) and self.request.retries < self.max_retries
+        logger.error("❌ Celery run %s failed%s: %s", run_id, " (retrying)" if retrying else "", e)
         
-        # Mark run as error
+        # Discard any partial result writes, then reset the run for the retry
+        # or mark it as error
         try:
-            run = db.query(Run).filter(Run.id == run_id).first()
-            if run:
-                run.status = RunStatus.ERROR.value
-                run.completed_at = datetime.utcnow()
-                run.error_message = str(e)
+            db.rollback()
+            if retrying:
+                _update_run(db, run_id, status=RunStatus.PENDING.value, started_at=None)
                 db.commit()
-                
-                task = db.query(Task).filter(Task.id == task_id).first()
-                if task:
-                    _update_task_stats(db, task)
+            else:
+                marked = _update_run(
+                    db, run_id,
+                    status=RunStatus.ERROR.value,
+                    completed_at=datetime.utcnow(),
+                    error_message=str(e),
+                )
+                if marked:
+                    task = db.get(Task, task_id)
+                    if task:
+                        _update_task_stats(db, task)
+                    db.commit()
+                    publish_task_event(task_id)
         except:
             pass
         
-        # Retry on transient errors
-        raise self.retry(exc=e)
+        if retrying:
+            raise self.retry(exc=e)
+        raise
         
     finally:
         db.close()
@@ -148,7 +183,7 @@ def publish_queue_metrics():
     try:
         publish_queue_depth_metric()
     except Exception as e:
-        print(f"⚠️  Failed to publish queue metrics: {e}")
+        logger.warning("⚠️  Failed to publish queue metrics: %s", e)
 
 
 @celery_app.task
@@ -158,97 +193,125 @@ def execute_all_runs(
     timeout_seconds: int = 1200,
 ):
     """
-    Queue all runs for a task with staggered starts.
+    Queue all runs for a task.
     
-    This creates the runs and dispatches them to workers with small delays
-    between batches to prevent Docker container race conditions.
+    This creates the runs and dispatches them to workers, each of which
+    starts at most HARBOR_RUN_RATE_LIMIT of them per second to prevent
+    Docker container race conditions.
     """
     db = SessionLocal()
     
-    # Stagger configuration
-    BATCH_SIZE = 20  # Start 20 runs at a time
-    BATCH_DELAY_SECONDS = 1  # 1 second delay between batches
-    
     try:
-        task = db.query(Task).filter(Task.id == task_id).first()
-        
-        if not task:
-            return {"error": "Task not found"}
-        
-        if task.status != TaskStatus.PENDING.value:
-            return {"error": f"Task is already {task.status}"}
+        # Update task status, only if still pending (check and update in one
+        # statement, so a concurrent start can't also create runs)
+        num_runs = db.execute(
+            update(Task)
+            .where(Task.id == task_id, Task.status == TaskStatus.PENDING.value)
+            .values(
+                status=TaskStatus.RUNNING.value,
+                started_at=datetime.utcnow(),
+                total_runs=Task.num_runs,
+            )
+            .returning(Task.num_runs)
+        ).scalar_one_or_none()
         
-        # Update task status
-        task.status = TaskStatus.RUNNING.value
-        task.started_at = datetime.utcnow()
+        if num_runs is None:
+            status = db.scalar(select(Task.status).where(Task.id == task_id))
+            if status is None:
+                return {"error": "Task not found"}
+            return {"error": f"Task is already {status}"}
         
-        # Create runs
-        run_ids = []
-        for run_num in range(1, task.num_runs + 1):
-            run = Run(
-                task_id=task.id,
-                run_number=run_num,
-                status=RunStatus.PENDING.value,
-            )
-            db.add(run)
-            db.flush()  # Get the run ID
-            run_ids.append(run.id)
+        # Create runs (one multi-row INSERT ... RETURNING id)
+        run_ids = list(db.scalars(
+            insert(Run).returning(Run.id, sort_by_parameter_order=True),
+            [
+                {"task_id": task_id, "run_number": run_num, "status": RunStatus.PENDING.value}
+                for run_num in range(1, num_runs + 1)
+            ],
+        ))
         
-        task.total_runs = task.num_runs
         db.commit()
+        publish_task_event(task_id)
         
-        print(f"▶️ Celery queuing {task.num_runs} runs for task {task_id} (staggered, {BATCH_SIZE} per batch)")
-        
-        # Queue each run with staggered start times
-        # This prevents Docker container race conditions at scale
-        for i, run_id in enumerate(run_ids):
-            # Calculate delay: runs in same batch start together
-            # Batch 0 (runs 0-19): delay 0s
-            # Batch 1 (runs 20-39): delay 1s
-            # Batch 2 (runs 40-59): delay 2s
-            batch_number = i // BATCH_SIZE
-            delay_seconds = batch_number * BATCH_DELAY_SECONDS
-            
-            execute_harbor_run.apply_async(
-                kwargs={
-                    "task_id": task_id,
-                    "run_id": run_id,
-                    "openrouter_api_key": openrouter_api_key,
-                    "timeout_seconds": timeout_seconds,
-                },
-                countdown=delay_seconds,
-            )
+        logger.info("▶️ Celery queuing %d runs for task %s", num_runs, task_id)
         
-        total_stagger_time = ((len(run_ids) - 1) // BATCH_SIZE) * BATCH_DELAY_SECONDS
-        print(f"📊 Stagger complete: {len(run_ids)} runs queued over {total_stagger_time}s")
+        # All runs are published as one group over a single producer; the
+        # task's rate limit spaces out their starts on the workers
+        group(
+            execute_harbor_run.s(
+                task_id=task_id,
+                run_id=run_id,
+                openrouter_api_key=openrouter_api_key,
+                timeout_seconds=timeout_seconds,
+            )
+            for run_id in run_ids
+        ).apply_async()
         
         return {
             "task_id": task_id,
             "runs_queued": len(run_ids),
             "run_ids": run_ids,
-            "stagger_seconds": total_stagger_time,
         }
         
     finally:
         db.close()
 
 
+def _is_transient_error(result: dict) -> bool:
+    """Whether a failed run's logs show a transient Docker/file mounting error."""
+    # Plain substring checks: str.find is far faster than an equivalent regex here
+    logs = result.get("logs", "") or ""
+    return (
+        "No such file or directory" in logs or
+        "/tests/test.sh" in logs and "not found" in logs.lower() or
+        "cannot set terminal process group" in logs
+    )
+
+
+def _update_run(db: Session, run_id: int, **values) -> int:
+    """Write the given columns of a run, bypassing the session's change tracking. Returns rows matched."""
+    result = db.execute(
+        update(Run).where(Run.id == run_id).values(**values),
+        execution_options={"synchronize_session": False},
+    )
+    return result.rowcount
+
+
 def _update_task_stats(db: Session, task: Task):
-    """Update task statistics based on completed runs."""
-    runs = db.query(Run).filter(Run.task_id == task.id).all()
+    """
+    Update task statistics based on completed runs.
+    
+    Runs in the caller's transaction (flushing its pending run changes so
+    they are counted); the caller commits. The task's row is locked first,
+    so concurrent finishers of the same task go one at a time: each counts
+    (in a statement started after the previous holder committed) its own
+    run plus every run committed before it, and the last one to commit
+    writes the complete counts.
+    """
+    db.flush()
     
-    completed_statuses = [RunStatus.PASSED.value, RunStatus.FAILED.value, RunStatus.ERROR.value]
-    completed_runs = [r for r in runs if r.status in completed_statuses]
-    passed_runs = [r for r in runs if r.status == RunStatus.PASSED.value]
-    failed_runs = [r for r in runs if r.status in [RunStatus.FAILED.value, RunStatus.ERROR.value]]
+    # Wait for other finishers of this task (a no-op on SQLite, which only
+    # has one writer at a time anyway)
+    db.execute(select(Task.id).where(Task.id == task.id).with_for_update())
     
-    task.total_runs = len(runs)
-    task.passed_runs = len(passed_runs)
-    task.failed_runs = len(failed_runs)
+    def count_runs(*statuses):
+        query = select(func.count(Run.id)).where(Run.task_id == task.id)
+        if statuses:
+            query = query.where(Run.status.in_(statuses))
+        return query.scalar_subquery()
     
     # Mark task complete if all runs done
-    if len(completed_runs) >= task.num_runs:
-        task.status = TaskStatus.COMPLETED.value
-        task.completed_at = datetime.utcnow()
+    all_done = count_runs(RunStatus.PASSED.value, RunStatus.FAILED.value, RunStatus.ERROR.value) >= Task.num_runs
     
-    db.commit()
+    db.execute(
+        update(Task)
+        .where(Task.id == task.id)
+        .values(
+            total_runs=count_runs(),
+            passed_runs=count_runs(RunStatus.PASSED.value),
+            failed_runs=count_runs(RunStatus.FAILED.value, RunStatus.ERROR.value),
+            status=case((all_done, TaskStatus.COMPLETED.value), else_=Task.status),
+            completed_at=case((all_done, datetime.utcnow()), else_=Task.completed_at),
+        ),
+        execution_options={"synchronize_session": False},
+    )
@@ -12,7 +12,21 @@ export OPENAI_API_BASE="https://api.openai.com/v1"
 # Add harbor to PATH
 export PATH="$HOME/.local/bin:$PATH"
 
-# Start Celery worker
+# Start Harbor worker in background (long runs: no prefetch, 4 concurrent runs)
+echo "🚀 Starting Harbor worker..."
+celery -A app.celery_app worker --loglevel=info -n harbor@%h -Q harbor \
+    --concurrency=${HARBOR_CONCURRENCY:-4} --prefetch-multiplier=1 &
+HARBOR_PID=$!
+
+# Start worker for short tasks in foreground. These are I/O-bound (Redis,
+# CloudWatch, DB), so use an eventlet pool with many green threads; psycopg2
+# is patched to yield to the hub at worker start (celery_app, needs
+# psycogreen). Harbor runs stay on prefork above (subprocess + file I/O isn't
+# eventlet-safe).
 echo "🚀 Starting Celery worker..."
-celery -A app.celery_app worker --loglevel=info --concurrency=4 -Q celery,harbor
+celery -A app.celery_app worker --loglevel=info -n default@%h -Q celery \
+    -P eventlet --concurrency=${CELERY_CONCURRENCY:-100} --prefetch-multiplier=16
+
+# If worker exits, kill harbor worker
+kill $HARBOR_PID 2>/dev/null
 
@@ -7,10 +7,21 @@ echo "⏰ Starting Celery Beat (for periodic metrics)..."
 celery -A app.celery_app beat --loglevel=info &
 BEAT_PID=$!
 
-# Start Worker in foreground
+# Start Harbor worker in background (long runs: no prefetch, 4 concurrent runs)
+echo "🚀 Starting Harbor worker..."
+celery -A app.celery_app worker --loglevel=info -n harbor@%h -Q harbor \
+    --concurrency=${HARBOR_CONCURRENCY:-4} --prefetch-multiplier=1 &
+HARBOR_PID=$!
+
+# Start worker for short tasks in foreground. These are I/O-bound (Redis,
+# CloudWatch, DB), so use an eventlet pool with many green threads; psycopg2
+# is patched to yield to the hub at worker start (celery_app, needs
+# psycogreen). Harbor runs stay on prefork above (subprocess + file I/O isn't
+# eventlet-safe).
 echo "🚀 Starting Celery worker..."
-celery -A app.celery_app worker --loglevel=info --concurrency=4 -Q celery,harbor
+celery -A app.celery_app worker --loglevel=info -n default@%h -Q celery \
+    -P eventlet --concurrency=${CELERY_CONCURRENCY:-100} --prefetch-multiplier=16
 
-# If worker exits, kill beat
-kill $BEAT_PID 2>/dev/null
+# If worker exits, kill harbor worker and beat
+kill $HARBOR_PID $BEAT_PID 2>/dev/null
 
@@ -0,0 +1,54 @@
+"""Shared test setup: a throwaway database and storage dirs for the app."""
+
+import os
+import tempfile
+
+# Settings are read once, on first import of the app, so the environment has
+# to be in place before any test module imports it. TEST_DATABASE_URL points
+# the tests at a real Postgres (the row-locking tests need one); otherwise
+# they use a temporary SQLite file
+_tmp_dir = tempfile.mkdtemp(prefix="tbench-tests-")
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL", f"sqlite:///{_tmp_dir}/test.db")
+os.environ["UPLOAD_DIR"] = os.path.join(_tmp_dir, "uploads")
+os.environ["JOBS_DIR"] = os.path.join(_tmp_dir, "jobs")
+
+import pytest
+
+from app.database import SessionLocal, engine
+from app.models import Base, Run, RunStatus, Task, TaskStatus
+
+
+@pytest.fixture
+def db():
+    """Fresh tables for each test, and a session on them."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def running_task(db):
+    """A running task whose runs have all started. Returns (task_id, run_ids)."""
+    def make(num_runs: int = 2):
+        task = Task(
+            name="task",
+            original_filename="task.zip",
+            file_path="/tmp/task.zip",
+            file_size=1,
+            model="openrouter/openai/gpt-4o",
+            num_runs=num_runs,
+            status=TaskStatus.RUNNING.value,
+            total_runs=num_runs,
+        )
+        task.runs = [
+            Run(run_number=run_num, status=RunStatus.RUNNING.value)
+            for run_num in range(1, num_runs + 1)
+        ]
+        db.add(task)
+        db.commit()
+        return task.id, [run.id for run in task.runs]
+    return make
@@ -0,0 +1,80 @@
+"""HarborRunner's handling of the harbor subprocess."""
+
+import os
+import subprocess
+import sys
+import zipfile
+
+import pytest
+
+from app import harbor_runner
+from app.harbor_runner import STDOUT_TAIL_BYTES, HarborRunner
+
+
+@pytest.fixture
+def runner(tmp_path):
+    return HarborRunner(task_path=str(tmp_path / "task"), model="openrouter/openai/gpt-4o", jobs_dir=str(tmp_path / "jobs"))
+
+
+def _python(code: str):
+    return (sys.executable, "-c", code)
+
+
+def test_run_harbor_returns_tails_and_removes_logs(runner):
+    cmd = _python("import sys; sys.stdout.write('x' * 100000 + 'end'); sys.stderr.write('oops')")
+    
+    returncode, stdout_tail, stderr_tail = runner._run_harbor(cmd, dict(os.environ), 30)
+    
+    assert returncode == 0
+    assert len(stdout_tail) == STDOUT_TAIL_BYTES and stdout_tail.endswith("end")
+    assert stderr_tail == "oops"
+    assert os.listdir(runner.jobs_dir) == []
+
+
+def test_run_harbor_timeout_kills_child_and_removes_logs(runner):
+    with pytest.raises(subprocess.TimeoutExpired):
+        runner._run_harbor(_python("import time; time.sleep(30)"), dict(os.environ), 0.5)
+    
+    assert os.listdir(runner.jobs_dir) == []
+
+
+@pytest.fixture(params=["libarchive", "zipfile"])
+def extractor(request, monkeypatch):
+    """Run the test through both extraction paths."""
+    if request.param == "zipfile":
+        monkeypatch.setattr(harbor_runner, "libarchive", None)
+    elif harbor_runner.libarchive is None:
+        pytest.skip("libarchive is not installed")
+    return request.param
+
+
+def test_extract_task_skips_unsafe_members(runner, extractor, tmp_path, caplog):
+    zip_path = tmp_path / "task.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("task/task.toml", "version = '1.0'")
+        zf.writestr("task/tests/test.sh", "exit 0")
+        zf.writestr("../escaped.txt", "x")
+        zf.writestr("../outside/task.toml", "x")
+        zf.writestr(str(tmp_path / "absolute.txt"), "x")
+    extract_to = tmp_path / "extract" / "here"
+    
+    task_dir = runner.extract_task(str(zip_path), str(extract_to))
+    
+    assert task_dir == str(extract_to / "task")
+    assert (extract_to / "task" / "tests" / "test.sh").read_text() == "exit 0"
+    assert not (extract_to.parent / "escaped.txt").exists()
+    assert not (extract_to.parent / "outside").exists()
+    assert not (tmp_path / "absolute.txt").exists()
+    assert "Skipped 3 unsafe path(s)" in caplog.text
+
+
+def test_extract_task_without_unsafe_members_logs_nothing(runner, extractor, tmp_path, caplog):
+    zip_path = tmp_path / "task.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("task.toml", "version = '1.0'")
+    
+    task_dir = runner.extract_task(str(zip_path), str(tmp_path / "extract"))
+    
+    assert task_dir == str(tmp_path / "extract")
+    assert (tmp_path / "extract" / "task.toml").exists()
+    assert "unsafe" not in caplog.text
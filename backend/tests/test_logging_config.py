@@ -0,0 +1,44 @@
+"""setup_logging in Celery workers, where sys.stderr is redirected into logging."""
+
+import atexit
+import logging
+import sys
+
+import pytest
+from celery.utils.log import LoggingProxy
+
+from app import logging_config
+from app.logging_config import setup_logging
+
+
+def _stop_listener():
+    """Stop setup_logging's listener thread (flushing queued records) and forget it."""
+    listener = logging_config._listener
+    if listener is not None:
+        atexit.unregister(listener.stop)
+        listener.stop()
+        logging_config._listener = None
+
+
+@pytest.fixture
+def reset_logging():
+    """Undo setup_logging after the test."""
+    yield
+    _stop_listener()
+    app_logger = logging.getLogger("app")
+    for handler in list(app_logger.handlers):
+        app_logger.removeHandler(handler)
+    app_logger.propagate = True
+
+
+@pytest.mark.parametrize("json_format", [False, True])
+def test_setup_logging_under_logging_proxy(reset_logging, capfd, monkeypatch, json_format):
+    # What a Celery worker does to sys.stderr (set here, in the test itself:
+    # capfd swaps its own stream back in when the test starts)
+    monkeypatch.setattr(sys, "stderr", LoggingProxy(logging.getLogger("celery.redirected")))
+    
+    setup_logging(json_format=json_format)
+    logging.getLogger("app.tasks").info("run %s done", 7)
+    _stop_listener()
+    
+    assert "run 7 done" in capfd.readouterr().err
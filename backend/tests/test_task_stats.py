@@ -0,0 +1,86 @@
+"""Task statistics when runs of the same task finish at the same time."""
+
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Select, Update
+from sqlalchemy.dialects import postgresql
+
+from app.database import SessionLocal, engine
+from app.models import RunStatus, Task, TaskStatus
+from app.tasks import _update_run, _update_task_stats
+
+
+def _finish(db, run_id: int, status: RunStatus):
+    _update_run(db, run_id, status=status.value, completed_at=datetime.utcnow())
+
+
+def test_finishers_complete_task(db, running_task):
+    task_id, run_ids = running_task(num_runs=2)
+    
+    for run_id, status in zip(run_ids, (RunStatus.PASSED, RunStatus.FAILED)):
+        with SessionLocal() as session:
+            _finish(session, run_id, status)
+            _update_task_stats(session, session.get(Task, task_id))
+            session.commit()
+    
+    task = db.get(Task, task_id)
+    assert (task.status, task.total_runs, task.passed_runs, task.failed_runs) == (
+        TaskStatus.COMPLETED.value, 2, 1, 1,
+    )
+    assert task.completed_at is not None
+
+
+def test_stats_lock_task_before_counting(db, running_task, monkeypatch):
+    task_id, run_ids = running_task(num_runs=1)
+    statements = []
+    execute = db.execute
+    
+    def recording_execute(statement, *args, **kwargs):
+        statements.append(statement)
+        return execute(statement, *args, **kwargs)
+    
+    monkeypatch.setattr(db, "execute", recording_execute)
+    _finish(db, run_ids[0], RunStatus.PASSED)
+    _update_task_stats(db, db.get(Task, task_id))
+    db.commit()
+    
+    # The run UPDATE, then the task's row lock, then the counting UPDATE
+    lock, count = statements[-2:]
+    assert isinstance(lock, Select)
+    assert "FOR UPDATE" in str(lock.compile(dialect=postgresql.dialect()))
+    assert isinstance(count, Update)
+
+
+@pytest.mark.skipif(
+    engine.dialect.name != "postgresql",
+    reason="needs concurrent writers (set TEST_DATABASE_URL to a Postgres database)",
+)
+def test_concurrent_finishers_complete_task(db, running_task):
+    task_id, run_ids = running_task(num_runs=2)
+    # Both run rows are written (uncommitted) before either counts
+    runs_written = threading.Barrier(len(run_ids), timeout=10)
+    errors = []
+    
+    def finisher(run_id):
+        try:
+            with SessionLocal() as session:
+                _finish(session, run_id, RunStatus.PASSED)
+                session.flush()
+                runs_written.wait()
+                _update_task_stats(session, session.get(Task, task_id))
+                session.commit()
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=finisher, args=(run_id,)) for run_id in run_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    
+    assert not errors
+    db.expire_all()
+    task = db.get(Task, task_id)
+    assert (task.status, task.passed_runs) == (TaskStatus.COMPLETED.value, 2)
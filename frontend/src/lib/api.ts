@@ -54,7 +54,6 @@ export interface Run {
   tests_total: number;
   tests_passed: number;
   tests_failed: number;
-  logs: string | null;
   error_message: string | null;
   duration_seconds: number | null;
 }
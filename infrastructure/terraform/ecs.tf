@@ -32,6 +32,8 @@ resource "aws_ecs_task_definition" "api" {
         { name = "S3_BUCKET_NAME", value = aws_s3_bucket.uploads.bucket },
         { name = "AWS_REGION", value = var.aws_region },
         { name = "CORS_ORIGINS", value = "*" },
+        { name = "DB_POOL_SIZE", value = tostring(var.api_db_pool_size) },
+        { name = "DB_MAX_OVERFLOW", value = tostring(var.api_db_max_overflow) },
       ]
       
       secrets = [
@@ -107,6 +109,9 @@ resource "aws_ecs_task_definition" "worker" {
         { name = "AWS_REGION", value = var.aws_region },
         { name = "OPENROUTER_API_BASE", value = "https://openrouter.ai/api/v1" },
         { name = "DOCKER_HOST", value = "unix:///var/run/docker.sock" },
+        { name = "HARBOR_WORKER_COUNT", value = tostring(var.worker_desired_count) },
+        { name = "DB_POOL_SIZE", value = tostring(var.worker_db_pool_size) },
+        { name = "DB_MAX_OVERFLOW", value = tostring(var.worker_db_max_overflow) },
       ]
       
       secrets = [
@@ -57,6 +57,39 @@ variable "db_password" {
   sensitive   = true
 }
 
+# DB connection pools (per engine, applied to every process of the service).
+# Each process has a sync and an async engine, so its worst case is
+# 2 x (pool_size + max_overflow) connections; the async engine only connects
+# in the API. Worst cases with the defaults below:
+#   API:     api_desired_count (2) x 4 gunicorn workers x 2 x (3 + 2) = 80
+#   Workers: worker_desired_count (4) x (HARBOR_CONCURRENCY (4) prefork
+#            children + 1 eventlet worker) x (1 + 1)                   = 40
+# db.t3.small allows ~150-200 connections in total, so scaling the services
+# out needs these lowered (or a bigger instance / RDS Proxy)
+variable "api_db_pool_size" {
+  description = "DB pool size per engine in each API process (gunicorn worker)"
+  type        = number
+  default     = 3
+}
+
+variable "api_db_max_overflow" {
+  description = "DB connections per engine an API process may open beyond api_db_pool_size"
+  type        = number
+  default     = 2
+}
+
+variable "worker_db_pool_size" {
+  description = "DB pool size per engine in each Celery worker process (runs one task at a time, except the eventlet worker)"
+  type        = number
+  default     = 1
+}
+
+variable "worker_db_max_overflow" {
+  description = "DB connections per engine a Celery worker process may open beyond worker_db_pool_size"
+  type        = number
+  default     = 1
+}
+
 # Redis
 variable "redis_node_type" {
   description = "ElastiCache node type"
@@ -96,7 +129,7 @@ variable "worker_memory" {
 }
 
 variable "worker_desired_count" {
-  description = "Number of worker tasks"
+  description = "Number of worker tasks (also splits the cluster-wide Harbor run start rate between them)"
   type        = number
   default     = 4
 }
@@ -22,11 +22,23 @@ class TestResult:
     duration: float
     error: str = None
 
+async def iter_task_events(session: aiohttp.ClientSession, base_url: str, task_id: int):
+    """Yield the task (as a dict) from its server-sent event stream until the server closes it."""
+    # No total timeout: the server sends at least a keepalive every 15s
+    timeout = aiohttp.ClientTimeout(total=None, sock_read=60)
+    async with session.get(f"{base_url}/api/tasks/{task_id}/events", timeout=timeout) as resp:
+        resp.raise_for_status()
+        async for line in resp.content:
+            if line.startswith(b'data:'):
+                yield json.loads(line[5:])
+
 class LoadTester:
     def __init__(self, base_url: str, api_key: str, task_zip_path: str):
         self.base_url = base_url.rstrip('/')
         self.api_key = api_key
         self.task_zip_path = Path(task_zip_path)
+        # Read once and shared by every upload instead of reopened per task
+        self.task_zip_bytes = self.task_zip_path.read_bytes()
         self.results: List[TestResult] = []
         
     async def upload_and_execute_task(self, session: aiohttp.ClientSession, task_num: int, num_runs: int) -> TestResult:
@@ -35,24 +47,23 @@ class LoadTester:
         
         try:
             # Upload task
-            with open(self.task_zip_path, 'rb') as f:
-                data = aiohttp.FormData()
-                data.add_field('file', f, filename=self.task_zip_path.name)
-                
-                async with session.post(
-                    f"{self.base_url}/api/tasks",
-                    params={
-                        'name': f'LoadTest-{task_num}',
-                        'model': 'openai/gpt-5.2',
-                        'agent': 'oracle',  # Use oracle for fast execution
-                        'num_runs': num_runs
-                    },
-                    data=data
-                ) as resp:
-                    if resp.status != 200:
-                        return TestResult(0, 'upload_failed', 0, 0, time.time() - start_time, await resp.text())
-                    task_data = await resp.json()
-                    task_id = task_data['id']
+            data = aiohttp.FormData()
+            data.add_field('file', self.task_zip_bytes, filename=self.task_zip_path.name)
+            
+            async with session.post(
+                f"{self.base_url}/api/tasks",
+                params={
+                    'name': f'LoadTest-{task_num}',
+                    'model': 'openai/gpt-5.2',
+                    'agent': 'oracle',  # Use oracle for fast execution
+                    'num_runs': num_runs
+                },
+                data=data
+            ) as resp:
+                if resp.status != 200:
+                    return TestResult(0, 'upload_failed', 0, 0, time.time() - start_time, await resp.text())
+                task_data = await resp.json()
+                task_id = task_data['id']
             
             # Execute task
             async with session.post(
@@ -62,22 +73,26 @@ class LoadTester:
                 if resp.status != 200:
                     return TestResult(task_id, 'execute_failed', 0, 0, time.time() - start_time, await resp.text())
             
-            # Poll for completion (max 10 minutes)
-            for _ in range(120):  # 120 × 5s = 10 minutes
-                await asyncio.sleep(5)
-                async with session.get(f"{self.base_url}/api/tasks/{task_id}") as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        if data['status'] == 'completed':
-                            return TestResult(
-                                task_id, 
-                                'completed',
-                                data['passed_runs'],
-                                data['total_runs'],
-                                time.time() - start_time
-                            )
+            # Wait for completion (max 10 minutes) - the server pushes each
+            # change instead of us polling every 5s
+            async def wait_until_done():
+                data = None
+                async for data in iter_task_events(session, self.base_url, task_id):
+                    pass
+                return data
+            
+            try:
+                data = await asyncio.wait_for(wait_until_done(), timeout=600)
+            except asyncio.TimeoutError:
+                return TestResult(task_id, 'timeout', 0, 0, time.time() - start_time)
             
-            return TestResult(task_id, 'timeout', 0, 0, time.time() - start_time)
+            return TestResult(
+                task_id,
+                data['status'],
+                data['passed_runs'],
+                data['total_runs'],
+                time.time() - start_time
+            )
             
         except Exception as e:
             return TestResult(0, 'error', 0, 0, time.time() - start_time, str(e))
@@ -89,7 +104,7 @@ class LoadTester:
         print(f"Concurrency: {concurrency} simultaneous uploads")
         print(f"{'='*60}\n")
         
-        connector = aiohttp.TCPConnector(limit=concurrency)
+        connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300, keepalive_timeout=55)
         async with aiohttp.ClientSession(connector=connector) as session:
             # Create semaphore for controlled concurrency
             sem = asyncio.Semaphore(concurrency)
@@ -6,6 +6,7 @@ Total: 250 runs with GPT-5.2 + terminus-2
 
 import asyncio
 import aiohttp
+import json
 import time
 import os
 
@@ -16,23 +17,22 @@ RUNS_PER_TAB = 10
 # API Key - set via environment variable or replace with your key
 API_KEY = os.getenv("OPENROUTER_API_KEY", "YOUR_API_KEY_HERE")
 
-async def upload_task(session, tab_num):
+async def upload_task(session, tab_num, zip_bytes):
     """Simulate one browser tab uploading and starting a task."""
     try:
         # Upload task
-        with open(ZIP_PATH, 'rb') as f:
-            data = aiohttp.FormData()
-            data.add_field('file', f, filename=f'task_tab_{tab_num}.zip')
-            
-            url = f"{API_BASE}/api/tasks?name=test-tab-{tab_num}&model=openrouter/openai/gpt-5.2&agent=terminus-2&num_runs={RUNS_PER_TAB}"
-            
-            async with session.post(url, data=data) as resp:
-                if resp.status != 200:
-                    print(f"❌ Tab {tab_num}: Upload failed - {await resp.text()}")
-                    return None
-                task = await resp.json()
-                task_id = task['id']
-                print(f"📤 Tab {tab_num}: Uploaded task {task_id}")
+        data = aiohttp.FormData()
+        data.add_field('file', zip_bytes, filename=f'task_tab_{tab_num}.zip')
+        
+        url = f"{API_BASE}/api/tasks?name=test-tab-{tab_num}&model=openrouter/openai/gpt-5.2&agent=terminus-2&num_runs={RUNS_PER_TAB}"
+        
+        async with session.post(url, data=data) as resp:
+            if resp.status != 200:
+                print(f"❌ Tab {tab_num}: Upload failed - {await resp.text()}")
+                return None
+            task = await resp.json()
+            task_id = task['id']
+            print(f"📤 Tab {tab_num}: Uploaded task {task_id}")
         
         # Start execution
         async with session.post(
@@ -51,41 +51,50 @@ async def upload_task(session, tab_num):
         print(f"❌ Tab {tab_num}: Error - {e}")
         return None
 
+async def iter_task_events(session, task_id):
+    """Yield the task (as a dict) from its server-sent event stream until the server closes it."""
+    # No total timeout: the server sends at least a keepalive every 15s
+    timeout = aiohttp.ClientTimeout(total=None, sock_read=60)
+    async with session.get(f"{API_BASE}/api/tasks/{task_id}/events", timeout=timeout) as resp:
+        resp.raise_for_status()
+        async for line in resp.content:
+            if line.startswith(b'data:'):
+                yield json.loads(line[5:])
+
 async def check_progress(session, task_ids):
-    """Check progress of all tasks."""
+    """Follow progress of all tasks (one event stream each, no polling)."""
     total_runs = len(task_ids) * RUNS_PER_TAB
+    latest = {}
     
-    while True:
-        completed = 0
-        passed = 0
-        failed = 0
-        running = 0
-        
-        for task_id in task_ids:
-            try:
-                async with session.get(f"{API_BASE}/api/tasks/{task_id}") as resp:
-                    if resp.status == 200:
-                        task = await resp.json()
-                        passed += task.get('passed_runs', 0)
-                        failed += task.get('failed_runs', 0)
-                        
-                        # Count running
-                        for run in task.get('runs', []):
-                            if run['status'] == 'running':
-                                running += 1
-            except:
-                pass
-        
+    def print_progress():
+        passed = sum(task.get('passed_runs', 0) for task in latest.values())
+        failed = sum(task.get('failed_runs', 0) for task in latest.values())
+        started = sum(task.get('total_runs', 0) for task in latest.values())
         completed = passed + failed
         pct = (completed / total_runs) * 100 if total_runs > 0 else 0
         
-        print(f"\r⏳ Progress: {completed}/{total_runs} ({pct:.1f}%) | ✅ {passed} | ❌ {failed} | 🏃 {running} running    ", end="", flush=True)
-        
-        if completed >= total_runs:
-            print()
-            return passed, failed
-        
-        await asyncio.sleep(5)
+        print(f"\r⏳ Progress: {completed}/{total_runs} ({pct:.1f}%) | ✅ {passed} | ❌ {failed} | 🏃 {started - completed} queued/running    ", end="", flush=True)
+    
+    async def follow(task_id):
+        # Reconnect if a stream drops before its task is done
+        while latest.get(task_id, {}).get('status') not in ('completed', 'failed', 'cancelled'):
+            try:
+                async for task in iter_task_events(session, task_id):
+                    latest[task_id] = task
+                    print_progress()
+            except aiohttp.ClientResponseError as e:
+                if e.status == 404:
+                    return  # Task deleted
+                await asyncio.sleep(5)
+            except Exception:
+                await asyncio.sleep(5)
+    
+    await asyncio.gather(*(follow(task_id) for task_id in task_ids))
+    print()
+    
+    passed = sum(task.get('passed_runs', 0) for task in latest.values())
+    failed = sum(task.get('failed_runs', 0) for task in latest.values())
+    return passed, failed
 
 async def main():
     print(f"🚀 Simulating {NUM_TABS} browser tabs, each with {RUNS_PER_TAB} runs")
@@ -95,13 +104,19 @@ async def main():
     
     start_time = time.time()
     
-    async with aiohttp.ClientSession() as session:
+    # Enough connections for every tab's upload and event stream at once
+    connector = aiohttp.TCPConnector(limit=100, limit_per_host=100, ttl_dns_cache=300, keepalive_timeout=55)
+    async with aiohttp.ClientSession(connector=connector) as session:
         # Upload all tasks simultaneously (like 25 tabs)
         print("=" * 50)
         print("Phase 1: Uploading tasks (simulating 25 tabs)...")
         print("=" * 50)
         
-        tasks = [upload_task(session, i+1) for i in range(NUM_TABS)]
+        # Read the ZIP once; every tab uploads the same bytes
+        with open(ZIP_PATH, 'rb') as f:
+            zip_bytes = f.read()
+        
+        tasks = [upload_task(session, i+1, zip_bytes) for i in range(NUM_TABS)]
         task_ids = await asyncio.gather(*tasks)
         task_ids = [t for t in task_ids if t is not None]
         
@@ -6,92 +6,196 @@ This tests infrastructure without LLM costs.
 
 import asyncio
 import aiohttp
+import json
+import random
 import time
-import os
 
 API_BASE = "http://tbench-runner-alb-1936777750.us-west-2.elb.amazonaws.com"
+TASKS_URL = f"{API_BASE}/api/tasks"
 ZIP_PATH = "sample-tasks/break-filter-js-from-html.zip"
 NUM_USERS = 15
 TASKS_PER_USER = 5
 RUNS_PER_TASK = 10
 TOTAL_RUNS = NUM_USERS * TASKS_PER_USER * RUNS_PER_TASK
-# API Key - set via environment variable or replace with your key
-API_KEY = os.getenv("OPENROUTER_API_KEY", "YOUR_API_KEY_HERE")
+# Progress comes from server-sent event streams, one per this many tasks.
+# Streams start during the upload phase: tasks created within this many
+# seconds of each other share one
+TASKS_PER_STREAM = 100
+STREAM_BATCH_SECONDS = 5.0
+# Uploads in flight at once (all 75 at once just queues them on the ALB/API)
+UPLOAD_CONCURRENCY = 10
+# Upload/start requests are retried, with exponential backoff and full
+# jitter, when they can't have reached the app: the connection failed or the
+# ALB answered for it (502/503/504). Other failures may have been applied by
+# the server, so they're only retried where it can be checked first
+MAX_ATTEMPTS = 5
+RETRY_STATUSES = {502, 503, 504}
+RETRY_BASE_SECONDS = 0.5
+RETRY_MAX_SECONDS = 30.0
 
-async def upload_and_start_task(session, user_num, task_num):
+async def post_with_retry(session, url, make_data=None, already_done=None, **kwargs):
+    """
+    POST url, retrying transient failures. Returns (status, body text) of the last response.
+    
+    POSTs aren't idempotent, so timeouts and dropped responses are only
+    retried when already_done is given: it's awaited before every retry and
+    returns True if an earlier attempt did go through, in which case
+    (None, None) is returned instead of posting again.
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        last_attempt = attempt == MAX_ATTEMPTS - 1
+        try:
+            # Form data can only be sent once, so it's rebuilt per attempt
+            async with session.post(url, data=make_data() if make_data else None, **kwargs) as resp:
+                text = await resp.text()
+                if resp.status not in RETRY_STATUSES or last_attempt:
+                    return resp.status, text
+        except aiohttp.ClientConnectorError:
+            # Never connected, so nothing was sent
+            if last_attempt:
+                raise
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if already_done is None or last_attempt:
+                raise
+        await asyncio.sleep(random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt)))
+        if already_done is not None and await already_done():
+            return None, None
+
+async def task_started(session, task_id):
+    """Whether the task has left pending, i.e. an execute-async request for it went through."""
+    try:
+        async with session.get(f"{TASKS_URL}/{task_id}") as resp:
+            return resp.status == 200 and (await resp.json())['status'] != 'pending'
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return False
+
+async def upload_and_start_task(session, user_num, task_num, zip_bytes):
     """Upload a task and start execution with oracle agent."""
     try:
         # Upload task
-        with open(ZIP_PATH, 'rb') as f:
+        def make_data():
             data = aiohttp.FormData()
-            data.add_field('file', f, filename=f'oracle-test-user{user_num}-task{task_num}.zip')
-            
-            url = f"{API_BASE}/api/tasks?name=oracle-user{user_num}-task{task_num}&model=openrouter/openai/gpt-4o&agent=oracle&num_runs={RUNS_PER_TASK}"
-            
-            async with session.post(url, data=data) as resp:
-                if resp.status != 200:
-                    text = await resp.text()
-                    print(f"❌ User {user_num}, Task {task_num}: Upload failed - {text}")
-                    return None
-                task = await resp.json()
-                task_id = task['id']
-        
-        # Start execution (oracle doesn't need API key, but we'll pass it anyway)
-        async with session.post(
-            f"{API_BASE}/api/tasks/{task_id}/execute-async",
-            params={"openrouter_api_key": API_KEY}
-        ) as resp:
-            if resp.status == 200:
-                result = await resp.json()
-                print(f"✅ User {user_num}, Task {task_num}: Task {task_id} - {result['runs_queued']} runs queued")
-                return task_id
-            else:
-                text = await resp.text()
-                print(f"❌ User {user_num}, Task {task_num}: Start failed - {text}")
-                return None
+            data.add_field('file', zip_bytes, filename=f'oracle-test-user{user_num}-task{task_num}.zip')
+            return data
+        
+        params = {
+            'name': f'oracle-user{user_num}-task{task_num}',
+            'model': 'openrouter/openai/gpt-4o',
+            'agent': 'oracle',
+            'num_runs': RUNS_PER_TASK,
+        }
+        
+        status, text = await post_with_retry(session, TASKS_URL, make_data, params=params)
+        if status != 200:
+            print(f"❌ User {user_num}, Task {task_num}: Upload failed - {text}")
+            return None
+        task_id = json.loads(text)['id']
+        
+        # Start execution (oracle doesn't need an API key). A retry after a
+        # lost response would be refused as "already running", so check first
+        status, text = await post_with_retry(
+            session, f"{TASKS_URL}/{task_id}/execute-async",
+            already_done=lambda: task_started(session, task_id),
+        )
+        if status is None:
+            print(f"✅ User {user_num}, Task {task_num}: Task {task_id} - started (confirmed after a lost response)")
+            return task_id
+        if status == 200:
+            result = json.loads(text)
+            print(f"✅ User {user_num}, Task {task_num}: Task {task_id} - {result['runs_queued']} runs queued")
+            return task_id
+        else:
+            print(f"❌ User {user_num}, Task {task_num}: Start failed - {text}")
+            return None
                 
     except Exception as e:
         print(f"❌ User {user_num}, Task {task_num}: Error - {e}")
         return None
 
-async def check_progress(session, task_ids):
-    """Check progress of all tasks."""
-    total_runs = len(task_ids) * RUNS_PER_TASK
+async def check_progress(session, new_task_ids):
+    """
+    Follow progress of all tasks over event streams (pushed by the server, no
+    polling), starting while they are still being uploaded.
     
-    while True:
-        completed = 0
-        passed = 0
-        failed = 0
-        running = 0
-        pending = 0
-        
-        for task_id in task_ids:
-            try:
-                async with session.get(f"{API_BASE}/api/tasks/{task_id}") as resp:
-                    if resp.status == 200:
-                        task = await resp.json()
-                        passed += task.get('passed_runs', 0)
-                        failed += task.get('failed_runs', 0)
-                        
-                        # Count running/pending
-                        for run in task.get('runs', []):
-                            if run['status'] == 'running':
-                                running += 1
-                            elif run['status'] == 'pending':
-                                pending += 1
-            except Exception as e:
-                pass
-        
+    Task IDs arrive on the new_task_ids queue as uploads finish, then None
+    once the upload phase is over. Progress is printed from then on.
+    """
+    num_tasks = 0
+    uploads_done = False
+    latest = {}
+    last_line = ""
+    
+    def print_progress():
+        nonlocal last_line
+        if not uploads_done:
+            return  # Keep the upload log readable; just track completions meanwhile
+        total_runs = num_tasks * RUNS_PER_TASK
+        passed = sum(task.get('passed_runs', 0) for task in latest.values())
+        failed = sum(task.get('failed_runs', 0) for task in latest.values())
+        started = sum(task.get('total_runs', 0) for task in latest.values())
         completed = passed + failed
         pct = (completed / total_runs) * 100 if total_runs > 0 else 0
         
-        print(f"\r⏳ Progress: {completed}/{total_runs} ({pct:.1f}%) | ✅ {passed} | ❌ {failed} | 🏃 {running} running | ⏸️  {pending} pending    ", end="", flush=True)
-        
-        if completed >= total_runs:
-            print()
-            return passed, failed
+        # Only redraw the progress line when it changed
+        line = f"⏳ Progress: {completed}/{total_runs} ({pct:.1f}%) | ✅ {passed} | ❌ {failed} | 🏃 {started - completed} queued/running    "
+        if line != last_line:
+            print("\r" + line, end="", flush=True)
+            last_line = line
+    
+    async def follow(chunk):
+        # The server closes the stream once all of its tasks are done.
+        # Dropped connections, timeouts and 5xx are reconnected (after a short
+        # pause); a 4xx won't change on retry, so the stream is given up
+        params = [('ids', task_id) for task_id in chunk]
+        # No total timeout: the server sends at least a keepalive every 15s
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=60)
+        while True:
+            try:
+                async with session.get(f"{TASKS_URL}/events", params=params, timeout=timeout) as resp:
+                    resp.raise_for_status()
+                    async for line in resp.content:
+                        if line.startswith(b'data:'):
+                            task = json.loads(line[5:])
+                            latest[task['id']] = task
+                            print_progress()
+                return
+            except aiohttp.ClientResponseError as e:
+                # Must come first: ClientResponseError is a ClientError too
+                if e.status < 500:
+                    print(f"\n❌ Events for tasks {chunk[0]}-{chunk[-1]}: {e.status} {e.message}")
+                    return
+                await asyncio.sleep(2)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                await asyncio.sleep(2)
+    
+    # Start a stream for each batch of new tasks as soon as it's complete
+    loop = asyncio.get_running_loop()
+    follows = []
+    while not uploads_done:
+        chunk = []
+        task_id = await new_task_ids.get()
+        deadline = loop.time() + STREAM_BATCH_SECONDS
+        while task_id is not None:
+            chunk.append(task_id)
+            if len(chunk) == TASKS_PER_STREAM:
+                break
+            try:
+                task_id = await asyncio.wait_for(new_task_ids.get(), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                break
+        uploads_done = task_id is None
         
-        await asyncio.sleep(5)
+        if chunk:
+            num_tasks += len(chunk)
+            follows.append(asyncio.create_task(follow(chunk)))
+    
+    print_progress()
+    await asyncio.gather(*follows)
+    print()
+    
+    passed = sum(task.get('passed_runs', 0) for task in latest.values())
+    failed = sum(task.get('failed_runs', 0) for task in latest.values())
+    return passed, failed
 
 async def main():
     print("=" * 70)
@@ -107,19 +211,49 @@ async def main():
     
     start_time = time.time()
     
-    async with aiohttp.ClientSession() as session:
-        # Upload all tasks simultaneously
+    # Everything goes to the one ALB host: cache its DNS for the whole test
+    # and keep idle connections for reuse (just under the ALB's 60s idle
+    # timeout, so we never reuse one it has already closed)
+    connector = aiohttp.TCPConnector(
+        limit=50,
+        limit_per_host=50,
+        ttl_dns_cache=300,
+        keepalive_timeout=55,
+        enable_cleanup_closed=True,
+    )
+    timeout = aiohttp.ClientTimeout(total=60)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        # Upload all tasks, UPLOAD_CONCURRENCY at a time
         print("=" * 70)
         print("Phase 1: Uploading tasks...")
         print("=" * 70)
         
+        # Read the ZIP once; every task uploads the same bytes
+        with open(ZIP_PATH, 'rb') as f:
+            zip_bytes = f.read()
+        
+        upload_sem = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+        new_task_ids = asyncio.Queue()
+        
+        async def bounded_upload(user_num, task_num):
+            async with upload_sem:
+                task_id = await upload_and_start_task(session, user_num, task_num, zip_bytes)
+            if task_id is not None:
+                new_task_ids.put_nowait(task_id)
+            return task_id
+        
         tasks = []
         for user_num in range(1, NUM_USERS + 1):
             for task_num in range(1, TASKS_PER_USER + 1):
-                tasks.append(upload_and_start_task(session, user_num, task_num))
+                tasks.append(bounded_upload(user_num, task_num))
+        
+        # Progress tracking starts with the first created task rather than
+        # after the last upload
+        progress = asyncio.create_task(check_progress(session, new_task_ids))
         
         task_ids = await asyncio.gather(*tasks)
         task_ids = [t for t in task_ids if t is not None]
+        new_task_ids.put_nowait(None)
         
         upload_time = time.time() - start_time
         print()
@@ -127,6 +261,7 @@ async def main():
         print()
         
         if not task_ids:
+            progress.cancel()
             print("❌ No tasks created!")
             return
         
@@ -137,7 +272,9 @@ async def main():
         print("(Oracle agent runs are fast - ~30 seconds each)")
         print()
         
-        passed, failed = await check_progress(session, task_ids)
+        # The event streams started with every task's current state, so runs
+        # that finished during the upload phase are already counted
+        passed, failed = await progress
         
         total_time = time.time() - start_time
         